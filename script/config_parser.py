@@ -14,12 +14,29 @@
 # See the Mulan PSL v2 for more details.
 import sys
 sys.dont_write_bytecode = True
-import json
+import copy
+import functools
 import os
 import glob
 import platform
+from collections import deque
+from itertools import chain
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__))))
-from methods import trans2list, unique_list, save_json_file
+from methods import trans2list, load_json_file, load_json_file_cached, save_json_file
+
+class FeatureInfo:
+    """ Information of a feature in the feature.json file """
+    __slots__ = ('lib', 'parent', 'children', 'opts', 'deps', 'impl', 'modules')
+
+    def __init__(self, lib):
+        self.lib = lib
+        self.parent = None
+        self.children = []
+        self.opts = []
+        self.deps = []
+        # {"c":[], "armv8":[], ...}, [] lists the instruction sets supported by the feature.
+        self.impl = {}
+        self.modules = []
 
 class FeatureParser:
     """ Parsing feature files """
@@ -32,14 +49,20 @@ class FeatureParser:
 
     def __init__(self, file_path):
         self._fp = file_path
-        with open(file_path, 'r', encoding='utf-8') as f:
-            self._cfg = json.loads(f.read())
-            self._file_check()
+        # The file is only read, so the parsed content can be shared.
+        self._cfg = load_json_file_cached(file_path)
+        self._file_check()
 
         # Features and related information.
         self._feas_info = self._get_feas_info()
+        # Features of each lib.
+        self._feas_by_lib = self._get_feas_by_lib()
+        # Ancestors of each feature.
+        self._ancestors = self._get_ancestors()
         # Assembly type supported by the openHiTLS.
         self._asm_types = self._get_asm_types()
+        # Transitive dependencies of each module.
+        self._mod_deps_cache = {}
 
     @property
     def libs(self):
@@ -57,83 +80,102 @@ class FeatureParser:
     def feas_info(self):
         return self._feas_info
 
+    @property
+    def feas_by_lib(self):
+        return self._feas_by_lib
+
+    @property
+    def ancestors(self):
+        return self._ancestors
+
     def _file_check(self):
         if 'libs' not in self._cfg or 'modules' not in self._cfg:
             raise FileNotFoundError("The format of file %s is incorrect." % self._fp)
 
-    @staticmethod
-    def _add_key_value(obj, key, value):
-        if value:
-            obj[key] = value
-
     def _add_fea(self, feas_info, fea, lib, parent, children, opts, deps, impl, ins_set):
-        feas_info.setdefault(fea, {})
-        self._add_key_value(feas_info[fea], 'lib', lib)
-        self._add_key_value(feas_info[fea], 'parent', parent)
-        self._add_key_value(feas_info[fea], 'children', children)
-        self._add_key_value(feas_info[fea], 'opts', opts)
-        self._add_key_value(feas_info[fea], 'deps', deps)
-
-        feas_info[fea].setdefault('impl', {})
-        feas_info[fea]['impl'][impl] = ins_set if ins_set else []
+        info = feas_info.get(fea)
+        if info is None:
+            info = FeatureInfo(lib)
+            feas_info[fea] = info
+        elif info.lib != lib:
+            # Feature names in different libraries must be unique.
+            raise ValueError("Error: feature '%s' has been defined in multiple libs." % fea)
+        if parent:
+            info.parent = parent
+        if children:
+            info.children = children
+        if opts:
+            info.opts = opts
+        if deps:
+            info.deps = deps
+
+        info.impl[impl] = ins_set if ins_set else []
 
     def _parse_fea_obj(self, lib, impl, parent, fea, fea_obj, feas_info):
-        if not fea_obj:
-            self._add_fea(feas_info, fea, lib, parent, None, None, None, impl, None)
-            return
-
-        opts = None
-        deps = None
-        ins_set = None
-        children = []
-        for key, obj in fea_obj.items():
-            if key == 'deps':
-                deps = obj
-                continue
-            if key == 'opts':
-                opts = obj
-                continue
-            if key == 'ins_set':
-                ins_set = obj
-                continue
-            children.append(key)
-            self._parse_fea_obj(lib, impl, fea, key, obj, feas_info)
+        """Walk the feature tree breadth-first and add the feature and all its sub-features."""
+        queue = deque([(parent, fea, fea_obj)])
+        while queue:
+            parent, fea, fea_obj = queue.popleft()
+            opts = None
+            deps = None
+            ins_set = None
+            children = []
+            for key, obj in (fea_obj or {}).items():
+                if key == 'deps':
+                    deps = obj
+                    continue
+                if key == 'opts':
+                    opts = obj
+                    continue
+                if key == 'ins_set':
+                    ins_set = obj
+                    continue
+                children.append(key)
+                queue.append((fea, key, obj))
 
-        self._add_fea(feas_info, fea, lib, parent, children, opts, deps, impl, ins_set)
+            self._add_fea(feas_info, fea, lib, parent, children, opts, deps, impl, ins_set)
 
     def _get_feas_info(self):
         """
         description: Parse the feature.json file to obtain feature information
                      and check that feature names in different libraries are unique.
         return:
-            feas_info: {
-                "children":[],  "parent":[],  "deps":[],
-                "opts":[[],[]],  "lib":"",
-                "impl":{"c":[], "armv8:[], ...}, # [] lists the instruction sets supported by the feature.
-            }
+            feas_info: {fea: FeatureInfo}
         """
-        all_feas = set()
-        lib_feas_info = {}
+        feas_info = {}
         for lib, lib_obj in self._cfg['libs'].items():
-            lib_feas_info[lib] = {}
-
             for impl, impl_obj in lib_obj['features'].items():
                 for fea, fea_obj in impl_obj.items():
-                    self._parse_fea_obj(lib, impl, None, fea, fea_obj, lib_feas_info[lib])
-
-            # Check that feature names in different libraries are unique.
-            lib_feas = set(lib_feas_info[lib].keys())
-            repeat_feas = all_feas.intersection(lib_feas)
-            if len(repeat_feas) != 0:
-                raise ValueError("Error: feature '%s' has been defined in multiple libs." % (repeat_feas))
-            all_feas.update(lib_feas)
+                    self._parse_fea_obj(lib, impl, None, fea, fea_obj, feas_info)
 
-        feas_info = {}
-        for obj in lib_feas_info.values():
-            feas_info.update(obj)
         self._fill_fea_modules(feas_info)
         return feas_info
 
+    def _get_feas_by_lib(self):
+        feas_by_lib = {}
+        for fea, info in self._feas_info.items():
+            feas_by_lib.setdefault(info.lib, []).append(fea)
+        return feas_by_lib
+
+    def _get_ancestors(self):
+        """Obtain the ancestors of each feature, that is, its parent, the parent of its parent and so on."""
+        ancestors = {}
+        for fea in self._feas_info:
+            # Walk up until a feature whose ancestors are known, then fill in the features on the way down.
+            path = []
+            cur = fea
+            while cur not in ancestors:
+                parent = self._feas_info[cur].parent
+                if not parent:
+                    ancestors[cur] = frozenset()
+                    break
+                path.append(cur)
+                cur = parent
+            for child in reversed(path):
+                ancestors[child] = ancestors[cur] | {cur}
+                cur = child
+        return ancestors
+
     def _fill_fea_modules(self, feas_info):
         for top_mod in self.modules:
             for mod, mod_obj in self.modules[top_mod].items():
@@ -141,10 +183,7 @@ class FeatureParser:
                 for fea in mod_obj.get('.features', []):
                     if fea not in feas_info:
                         raise ValueError("Unrecognized '%s' in '.features' of '%s::%s'" % (fea, top_mod, mod))
-                    if 'modules' not in feas_info[fea]:
-                        feas_info[fea]['modules'] = [formated_mod]
-                    else:
-                        feas_info[fea]['modules'].append(formated_mod)
+                    feas_info[fea].modules.append(formated_mod)
 
     def _get_asm_types(self):
         asm_type_set = set()
@@ -153,30 +192,43 @@ class FeatureParser:
         asm_type_set.add('no_asm')
         return asm_type_set
 
-    def get_module_deps(self, module, dep_list, result):
-        return self._get_module_deps(module, dep_list, result)
-
-    def _get_module_deps(self, module, dep_list, result):
+    def get_module_deps(self, module, visiting, result):
         """
-        Recursively obtains the modules on which the modules depend.
         module:   [IN]  module name, such as crypto::sha2
-        dep_list: [OUT] Dependency list, which is an intermediate variable
+        visiting: [IN]  Modules in the current dependency chain, which is an intermediate variable
         result:   [OUT] result
         """
+        result.update(self._get_module_deps(module, visiting))
+
+    def _get_module_deps(self, module, visiting):
+        """
+        Recursively obtains the modules on which the module depends.
+        The result of each module is cached, so shared dependency subtrees are resolved only once.
+        module:   [IN] module name, such as crypto::sha2
+        visiting: [IN] Modules in the current dependency chain
+        return: frozenset of the dependent modules
+        """
+        if module in self._mod_deps_cache:
+            return self._mod_deps_cache[module]
+        if module in visiting:
+            # A module that already exists in a dependency chain is a circular dependency.
+            raise Exception("Cyclic dependency")
+
         top_module, sub_module = module.split('::')
         mod_obj = self.modules[top_module][sub_module]
 
-        if '.deps' not in mod_obj:
-            result.update(dep_list)
-            return
+        deps = set()
+        visiting.add(module)
+        try:
+            for dep_mod in mod_obj.get('.deps', []):
+                deps.add(dep_mod)
+                deps.update(self._get_module_deps(dep_mod, visiting))
+        finally:
+            visiting.discard(module)
 
-        for dep_mod in mod_obj['.deps']:
-            if dep_mod in dep_list:
-                # A dependency that already exists in a dependency chain is a circular dependency.
-                raise Exception("Cyclic dependency")
-            dep_list.append(dep_mod)
-            self._get_module_deps(dep_mod, dep_list, result)
-            dep_list.pop()
+        deps = frozenset(deps)
+        self._mod_deps_cache[module] = deps
+        return deps
 
     def get_mod_srcs(self, top_mod, sub_mod, mod_obj):
         srcs = self._cfg['modules'][top_mod][sub_mod]['.srcs']
@@ -202,7 +254,7 @@ class FeatureParser:
         if inc:
             blurred_srcs.extend(trans2list(srcs[asm_type][inc]))
         else:
-            first_key = list(srcs[asm_type].keys())[0]
+            first_key = next(iter(srcs[asm_type]))
             blurred_srcs.extend(trans2list(srcs[asm_type][first_key]))
         return blurred_srcs
 
@@ -222,14 +274,23 @@ class FeatureConfigParser:
         "asmType":{"require": True, "type": str, "choices": [], "default": "no_asm"},
         "libs":{"require": True, "type": dict, "choices": [], "default": {}}
     }
+    # Check whether the value is in the choices, by the type of the value.
+    value_checkers = {
+        str: lambda value, choices: value in choices,
+        list: lambda value, choices: choices.issuperset(value)
+    }
 
     def __init__(self, features: FeatureParser, file_path):
         self._features = features
         self._config_file = file_path
-        with open(file_path, 'r', encoding='utf-8') as f:
-            self._cfg = json.loads(f.read())
+        # Closure of related features, keyed by feature name.
+        self._related_cache = {}
+        # Result of get_enable_modules and the configuration it was obtained from.
+        self._enable_modules_cache = None
+        self._cfg = load_json_file(file_path)
         self.key_value['asmType']['choices'] = list(features.asm_types)
         self.key_value['libs']['choices'] = list(features.libs)
+        self._choices = {key: frozenset(value['choices']) for key, value in self.key_value.items()}
         self._file_check()
 
     @classmethod
@@ -253,21 +314,21 @@ class FeatureConfigParser:
         return self._cfg['asmType']
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def _get_fea_and_inc(asm_fea):
-        if '::' in asm_fea:
-            return asm_fea.split('::')
-        else:
-            return asm_fea, ''
+        # The same assembly features are split on every traversal, split each of them only once.
+        fea, _, inc = asm_fea.partition('::')
+        return fea, inc
 
     def _asm_fea_check(self, asm_fea, asm_type, info):
         fea, inc = self._get_fea_and_inc(asm_fea)
         feas_info = self._features.feas_info
         if fea not in feas_info:
             raise ValueError("Unsupported '%s' in %s" % (fea, info))
-        if asm_type not in feas_info[fea]['impl']:
+        if asm_type not in feas_info[fea].impl:
             raise ValueError("Feature '%s' has no assembly implementation of type '%s' in %s" % (fea, asm_type, info))
         if inc:
-            if inc not in feas_info[fea]['impl'] and inc not in feas_info[fea]['impl'][asm_type]:
+            if inc not in feas_info[fea].impl and inc not in feas_info[fea].impl[asm_type]:
                 raise ValueError("Unsupported instruction set of '%s' in %s" % (asm_fea, info))
         return fea, inc
 
@@ -278,25 +339,22 @@ class FeatureConfigParser:
                     raise ValueError("Error feature_config file: missing '%s'" % key)
 
         for key, value in self._cfg.items():
-            if key not in self.key_value.keys():
+            spec = self.key_value.get(key)
+            if spec is None:
                 raise ValueError("Error feature_config file: unsupported config '%s'" % key)
-            if not isinstance(value, self.key_value.get(key).get("type")):
+            if not isinstance(value, spec["type"]):
                 raise ValueError("Error feature_config file: wrong type of '%s'" % key)
 
-            value_type = type(value)
-            if value_type == str or value_type == str:
-                if value not in self.key_value.get(key).get("choices"):
-                    raise ValueError("Error feature_config file: wrong value of '%s'" % key)
-            elif value_type == list:
-                choices = set(self.key_value[key]["choices"])
-                if not set(value).issubset(choices):
-                    raise ValueError("Error feature_config file: wrong value of '%s'" % key)
+            checker = self.value_checkers.get(type(value))
+            if checker and not checker(value, self._choices[key]):
+                raise ValueError("Error feature_config file: wrong value of '%s'" % key)
 
+        feas_info = self._features.feas_info
         for lib, lib_obj in self._cfg['libs'].items():
             if lib not in self._features.libs:
                 raise ValueError("Error feature_config file: unsupported lib '%s'" % lib)
             for fea in lib_obj.get('c', []):
-                if fea not in self._features.feas_info:
+                if fea not in feas_info:
                     raise ValueError("Error feature_config file: unsupported fea '%s' in lib '%s'" % (fea, lib))
             asm_feas = []
             for asm_fea in lib_obj.get('asm', []):
@@ -316,39 +374,50 @@ class FeatureConfigParser:
                 key, self.key_value.get(key).get('default')))
             self._cfg[key] = self.key_value.get(key).get('default')
 
-    def _get_related_feas(self, fea, feas_info, related: set):
-        related.add(fea)
-        if 'parent' in feas_info[fea]:
-            parent = feas_info[fea]['parent']
-            for dep in feas_info[parent].get('deps', []):
-                self._get_related_feas(dep, feas_info, related)
-        if 'children' in feas_info[fea]:
-            for child in feas_info[fea]['children']:
-                self._get_related_feas(child, feas_info, related)
-        if 'deps' in feas_info[fea]:
-            for dep in feas_info[fea]['deps']:
-                self._get_related_feas(dep, feas_info, related)
+    def _get_related_feas(self, fea):
+        """
+        Obtain the feature and all features related to it: its children, its dependencies
+        and the dependencies of its parent, recursively.
+        The result is cached, feas_info does not change after FeatureParser is constructed.
+        """
+        if fea in self._related_cache:
+            return self._related_cache[fea]
+
+        feas_info = self._features.feas_info
+        related_cache = self._related_cache
+        related = {fea}
+        queue = deque([fea])
+        while queue:
+            rel = feas_info[queue.popleft()]
+            parent_deps = feas_info[rel.parent].deps if rel.parent else []
+            for next_fea in chain(parent_deps, rel.children, rel.deps):
+                if next_fea in related:
+                    continue
+                if next_fea in related_cache:
+                    # The closure of a visited feature is already known, do not walk it again.
+                    related |= related_cache[next_fea]
+                    continue
+                related.add(next_fea)
+                queue.append(next_fea)
+
+        related = frozenset(related)
+        self._related_cache[fea] = related
+        return related
 
     def _get_json_feas(self, enable_feas, asm_feas):
+        feas_info = self._features.feas_info
         for _, lib_obj in self._cfg['libs'].items():
             for fea in lib_obj.get('c', []):
-                related_feas = set()
-                self._get_related_feas(fea, self._features.feas_info, related_feas)
-                enable_feas.update(related_feas)
+                enable_feas |= self._get_related_feas(fea)
             for asm_fea in lib_obj.get('asm', []):
                 fea, inc = self._get_fea_and_inc(asm_fea)
                 enable_feas.add(fea)
                 asm_feas[fea] = inc
-                if 'children' in self._features.feas_info[fea]:
-                    enable_feas.update(self._features.feas_info[fea]['children'])
+                enable_feas.update(feas_info[fea].children)
 
     def _get_parents(self, disables):
-        parents = set()
-        for d in disables:
-            relation = self._features.feas_info.get(d)
-            if relation and 'parent' in relation:
-                parents.add(relation['parent'])
-        return parents
+        feas_info = self._features.feas_info
+        return frozenset(feas_info[d].parent for d in disables if d in feas_info and feas_info[d].parent)
 
     def get_enable_feas(self, enables):
         """
@@ -368,25 +437,22 @@ class FeatureConfigParser:
         for enable in enables:
             if enable in self._features.libs:
                 # lib
-                for fea, info in self._features.feas_info.items():
-                    if enable == info['lib']:
-                        enable_feas.add(fea)
+                enable_feas.update(self._features.feas_by_lib.get(enable, []))
             else:
                 # The feature is not lib and needs to be added separately.
-                related_feas = set()
-                self._get_related_feas(enable, self._features.feas_info, related_feas)
-                enable_feas.update(related_feas)
+                enable_feas |= self._get_related_feas(enable)
         return enable_feas, enable_asm_feas
 
     def _add_feature(self, fea, impl_type, inc=''):
         add_fea = fea if inc == '' else '{}::{}'.format(fea, inc)
-        lib = self._features.feas_info[fea]['lib']
-        if lib not in self._cfg['libs']:
-            self._cfg['libs'][lib] = {impl_type: [add_fea]}
-        elif impl_type not in self._cfg['libs'][lib]:
-            self._cfg['libs'][lib][impl_type] = [add_fea]
-        elif fea not in self._cfg['libs'][lib][impl_type]:
-            self._cfg['libs'][lib][impl_type].append(add_fea)
+        lib = self._features.feas_info[fea].lib
+        libs = self._cfg['libs']
+        if lib not in libs:
+            libs[lib] = {impl_type: [add_fea]}
+        elif impl_type not in libs[lib]:
+            libs[lib][impl_type] = [add_fea]
+        elif fea not in libs[lib][impl_type]:
+            libs[lib][impl_type].append(add_fea)
 
     def set_asm_type(self, asm_type):
         if self._cfg['asmType'] == 'no_asm':
@@ -406,20 +472,21 @@ class FeatureConfigParser:
                 fea, inc = self._asm_fea_check(asm_feature, asm_type, 'input asm list')
                 if fea not in enable_feas:
                     raise ValueError("To add '%s' assembly requires add it to 'enable' list" % fea)
-                if inc and inc != asm_type and inc not in self._features.feas_info[fea]['impl'][asm_type]:
+                if inc and inc != asm_type and inc not in feas_info[fea].impl[asm_type]:
                     raise ValueError("Unsupported instruction set '%s' of fea '%s'" % (inc, fea))
                 self._add_feature(fea, 'asm', inc)
                 added_asm_feas[fea] = inc
         else:
             for fea in enable_feas:
-                if asm_type not in feas_info[fea]['impl']:
+                if asm_type not in feas_info[fea].impl:
                     continue
                 self._add_feature(fea, 'asm')
                 added_asm_feas[fea] = ''
 
     def set_c_features(self, enable_feas):
+        feas_info = self._features.feas_info
         for fea in enable_feas:
-            if 'c' in self._features.feas_info[fea]['impl']:
+            if 'c' in feas_info[fea].impl:
                 self._add_feature(fea, 'c')
 
     def _update_enable_feature(self, features, disables):
@@ -428,28 +495,23 @@ class FeatureConfigParser:
         Therefore, the sub-feature is removed and the parent feature is retained.
         """
         disable_parents = self._get_parents(disables)
-        tmp_feas = features.copy()
+        features_set = set(features)
+        disables_set = set(disables)
         enable_set = set()
         feas_info = self._features.feas_info
-        for fea in tmp_feas:
-            rel = feas_info[fea]
+        ancestors = self._features.ancestors
+        for fea in features:
             if fea in disable_parents:
-                if 'children' in rel:
-                    enable_set.update(rel['children'])
+                enable_set.update(feas_info[fea].children)
                 enable_set.discard(fea)
             else:
-                is_fea_contained = False
-                while 'parent' in rel:
-                    if rel['parent'] in disables:
-                        raise Exception("The 'disables' features {} and 'enables' featrues {} conflict".format(fea, disables))
-
-                    if rel['parent'] in features:
-                        is_fea_contained = True
-                        break
-                    rel = feas_info[rel['parent']]
-                if not is_fea_contained:
+                fea_ancestors = ancestors[fea]
+                if fea_ancestors & disables_set:
+                    raise Exception("The 'disables' features {} and 'enables' featrues {} conflict".format(fea, disables))
+                # The feature is contained if one of its ancestors is enabled.
+                if not fea_ancestors & features_set:
                     enable_set.add(fea)
-        enable_set.difference_update(set(disables))
+        enable_set.difference_update(disables_set)
         return list(enable_set)
 
     def _check_bn_config(self):
@@ -529,15 +591,16 @@ class FeatureConfigParser:
 
     def get_fea_macros(self):
         macros = set()
+        asm_type_upper = self.asm_type.upper()
         for lib, lib_value in self.libs.items():
             lib_upper = lib.upper()
-            for fea in lib_value.get('c', []):
-                macros.add("-D%s_%s" % (lib_upper, fea.upper()))
-            for fea in lib_value.get('asm', []):
-                fea = fea.split('::')[0]
-                macros.add("-D%s_%s" % (lib_upper, fea.upper()))
-                macros.add("-D%s_%s_ASM" % (lib_upper, fea.upper()))
-                macros.add("-D%s_%s_%s" % (lib_upper, fea.upper(), self.asm_type.upper()))
+            macros.update("-D%s_%s" % (lib_upper, fea.upper()) for fea in lib_value.get('c', []))
+            for asm_fea in lib_value.get('asm', []):
+                fea, _ = self._get_fea_and_inc(asm_fea)
+                fea_macro = "-D%s_%s" % (lib_upper, fea.upper())
+                macros.add(fea_macro)
+                macros.add(fea_macro + "_ASM")
+                macros.add("%s_%s" % (fea_macro, asm_type_upper))
 
         if self._cfg['endian'] == 'big':
             macros.add("-DHITLS_BIG_ENDIAN")
@@ -554,28 +617,35 @@ class FeatureConfigParser:
 
     def _re_get_fea_modules(self, fea, feas_info, asm_type, inc, modules):
         """Obtain the modules on which the current feature and subfeature depend."""
-        for mod in feas_info[fea].get('modules', []):
+        info = feas_info[fea]
+        for mod in info.modules:
             modules.setdefault(mod, {})
             modules[mod]["asmType"] = asm_type
             if inc:
                 modules[mod]["incSet"] = inc
 
-        for child in feas_info[fea].get('children', []):
+        for child in info.children:
             self._re_get_fea_modules(child, feas_info, asm_type, inc, modules)
 
     def _get_lib_modules(self, lib):
         """Obtain the enabled modules and their instruction sets."""
         lib_modules = {}
         feas_info = self._features.feas_info
-        for fea in self.libs[lib].get('c', []):
+        lib_obj = self.libs[lib]
+        for fea in lib_obj.get('c', []):
             self._re_get_fea_modules(fea, feas_info, 'c', '', lib_modules)
 
-        for asm_fea in self.libs[lib].get('asm', []):
+        for asm_fea in lib_obj.get('asm', []):
             fea, inc = self._get_fea_and_inc(asm_fea)
             self._re_get_fea_modules(fea, feas_info, self.asm_type, inc, lib_modules)
 
         return lib_modules
 
+    def _cfg_fingerprint(self):
+        """The configuration items on which the enabled modules depend."""
+        return (self.asm_type, tuple((lib, tuple(lib_obj.get('c', [])), tuple(lib_obj.get('asm', [])))
+                                     for lib, lib_obj in self.libs.items()))
+
     def get_enable_modules(self):
         """
         Obtain the modules required for compiling each lib features
@@ -584,27 +654,36 @@ class FeatureConfigParser:
             2. Check whether the dependent modules are enabled.
         return: {'lib':{"mod1":{"deps":[], "asmType":"", "incSet":""}}}
                 Module format: top_dir::sub_dir
+        The result is cached until the configuration changes, the caller gets a copy of it.
         """
+        fingerprint = self._cfg_fingerprint()
+        if self._enable_modules_cache and self._enable_modules_cache[0] == fingerprint:
+            return copy.deepcopy(self._enable_modules_cache[1])
+
         enable_libs_mods = {}
         enable_mods = set()
+        get_module_deps = self._features.get_module_deps
         for lib in self.libs.keys():
-            enable_libs_mods[lib] = self._get_lib_modules(lib)
-            for mod in enable_libs_mods[lib]:
-                mod_dep_mods = set()
-                self._features.get_module_deps(mod, [], mod_dep_mods)
-                enable_libs_mods[lib][mod]['deps'] = list(mod_dep_mods)
-            if len(enable_libs_mods[lib].keys()) == 0:
+            lib_mods = self._get_lib_modules(lib)
+            if not lib_mods:
                 raise ValueError("Error: no module is enabled in lib%s" % lib)
-            enable_mods.update(enable_libs_mods[lib])
-
-        # Check whether the dependent module is enabled.
-        for lib in enable_libs_mods.keys():
-            for mod in enable_libs_mods[lib]:
-                for dep_mod in enable_libs_mods[lib][mod].get('deps', []):
-                    if dep_mod == "platform::Secure_C":
-                        continue
-                    if dep_mod not in enable_mods:
-                        raise ValueError("Error: '%s' depends on '%s', but '%s' is disabled." % (mod, dep_mod, dep_mod))
+            for mod, mod_obj in lib_mods.items():
+                mod_dep_mods = set()
+                get_module_deps(mod, set(), mod_dep_mods)
+                mod_obj['deps'] = list(mod_dep_mods)
+            enable_libs_mods[lib] = lib_mods
+            enable_mods.update(lib_mods)
+
+        # Check whether the dependent module is enabled, "platform::Secure_C" is always available.
+        enable_mods.add("platform::Secure_C")
+        for lib_mods in enable_libs_mods.values():
+            for mod, mod_obj in lib_mods.items():
+                if enable_mods.issuperset(mod_obj['deps']):
+                    continue
+                dep_mod = next(dep for dep in mod_obj['deps'] if dep not in enable_mods)
+                raise ValueError("Error: '%s' depends on '%s', but '%s' is disabled." % (mod, dep_mod, dep_mod))
+
+        self._enable_modules_cache = (fingerprint, copy.deepcopy(enable_libs_mods))
         return enable_libs_mods
 
     def filter_no_asm_config(self):
@@ -614,10 +693,11 @@ class FeatureConfigParser:
                 self._cfg['libs'][lib]['asm'] = []
 
     def _check_fea_opts_arr(self, opts, fea, enable_feas):
+        feas_info = self._features.feas_info
         for opt_arr in opts:
             has_opt = False
             for opt_fea in opt_arr:
-                parent = self._features.feas_info[opt_fea].get('parent', '')
+                parent = feas_info[opt_fea].parent
                 if opt_fea in enable_feas or (parent and parent in enable_feas):
                     has_opt = True
                     continue
@@ -625,32 +705,41 @@ class FeatureConfigParser:
                 raise ValueError("The fea '%s' must work with at leaset one fea in %s" % (fea, opt_arr))
 
     def _check_opts(self, fea, enable_feas):
-        if 'opts' not in self._features.feas_info[fea]:
+        opts = self._features.feas_info[fea].opts
+        if not opts:
             return
-        opts = self._features.feas_info[fea]['opts']
         if not isinstance(opts[0], list):
             opts = [opts]
 
         self._check_fea_opts_arr(opts, fea, enable_feas)
 
-    def _check_family_opts(self, fea, key, enable_feas):
-        values = self._features.feas_info[fea].get(key, [])
-        if not isinstance(values, list):
-            values = [values]
-        for value in values:
-            self._check_opts(value, enable_feas)
-            self._check_family_opts(value, key, enable_feas)
-
     def check_fea_opts(self):
         enable_feas = set()
         for _, lib_obj in self.libs.items():
             enable_feas.update(lib_obj.get('c', []))
             enable_feas.update(lib_obj.get('asm', []))
+
+        # Check the enabled features, their ancestors and their descendants, each of them only once.
+        feas_info = self._features.feas_info
+        ancestors = self._features.ancestors
+        to_check = set()
+        descendants = set()
+        queue = deque()
         for fea in enable_feas:
-            fea = fea.split("::")[0]
+            fea, _ = self._get_fea_and_inc(fea)
+            to_check.update(ancestors[fea])
+            if fea not in descendants:
+                descendants.add(fea)
+                queue.append(fea)
+        while queue:
+            for child in feas_info[queue.popleft()].children:
+                if child not in descendants:
+                    descendants.add(child)
+                    queue.append(child)
+        to_check.update(descendants)
+
+        for fea in to_check:
             self._check_opts(fea, enable_feas)
-            self._check_family_opts(fea, 'parent', enable_feas)
-            self._check_family_opts(fea, 'children', enable_feas)
 
 class CompleteOptionParser:
     """ Parses all compilation options. """
@@ -671,14 +760,19 @@ class CompleteOptionParser:
 
     def __init__(self, file_path):
         self._fp = file_path
-        with open(file_path, 'r') as f:
-            self._cfg = json.loads(f.read())
-            self._file_check()
+        # The file is only read, so the parsed content can be shared.
+        self._cfg = load_json_file_cached(file_path)
+        self._file_check()
 
+        # The options are interned, so that comparing them with the options of the other files is cheaper.
         self._option_type_map = {}
+        self._type_options_set = {}
         for option_type in self._cfg['compileFlag']:
-            for option in trans2list(self._cfg['compileFlag'][option_type]):
+            options = [sys.intern(option) for option in trans2list(self._cfg['compileFlag'][option_type])]
+            option_type = sys.intern(option_type)
+            for option in options:
                 self._option_type_map[option] = option_type
+            self._type_options_set[option_type] = frozenset(options)
 
     @property
     def option_type_map(self):
@@ -688,6 +782,10 @@ class CompleteOptionParser:
     def type_options_map(self):
         return self._cfg['compileFlag']
 
+    @property
+    def type_options_set(self):
+        return self._type_options_set
+
     def _file_check(self):
         if 'compileFlag' not in self._cfg or 'linkFlag' not in self._cfg:
             raise FileNotFoundError("The format of file %s is incorrect." % self._fp)
@@ -698,12 +796,29 @@ class CompleteOptionParser:
 class CompileConfigParser:
     """ Parse the user compilation configuration file. """
 
+    # Option types kept by filter_hitls_defines.
+    define_option_types = frozenset(['CC_USER_DEFINE_FLAGS', 'CC_DEFINE_FLAGS'])
+    # Options added and removed by add_debug_options.
+    debug_options_add = ('-g3', '-gdwarf-2')
+    debug_options_del = ('-O2', '-D_FORTIFY_SOURCE=2')
+
+    __slots__ = ('_cfg', '_all_options', '_version')
+
     def __init__(self, all_options: CompleteOptionParser, file_path=''):
-        with open(file_path, 'r') as f:
-            self._cfg = json.loads(f.read())
+        self._cfg = load_json_file(file_path)
         self._all_options = all_options
+        # Incremented each time the options or link flags are changed.
+        self._version = 0
         self._file_check()
 
+        # Store the options and link flags in dicts (insertion-ordered and without duplicates),
+        # so that adding one is O(1). They are saved as lists. The strings are interned like the complete options.
+        for type_cfg in self._cfg['compileFlag'].values():
+            for option_op, options in type_cfg.items():
+                type_cfg[option_op] = dict.fromkeys(map(sys.intern, options))
+        for link_op, flags in self._cfg['linkFlag'].items():
+            self._cfg['linkFlag'][link_op] = dict.fromkeys(map(sys.intern, flags))
+
     @property
     def options(self):
         return self._cfg['compileFlag']
@@ -712,6 +827,10 @@ class CompileConfigParser:
     def link_flags(self):
         return self._cfg['linkFlag']
 
+    @property
+    def version(self):
+        return self._version
+
     @classmethod
     def default_cfg(cls):
         config = {
@@ -730,44 +849,44 @@ class CompileConfigParser:
                 continue
 
             for option in self._cfg['compileFlag'][option_type].get('CC_FLAGS_ADD', []):
-                if option not in self._all_options.type_options_map[option_type]:
+                if option not in self._all_options.type_options_set[option_type]:
                     raise ValueError("unrecognized option {}".format(option))
 
     def save(self, path):
-        save_json_file(self._cfg, path)
+        cfg = dict(self._cfg)
+        cfg['compileFlag'] = {option_type: {option_op: list(options) for option_op, options in type_cfg.items()}
+                              for option_type, type_cfg in self.options.items()}
+        cfg['linkFlag'] = {link_op: list(flags) for link_op, flags in self.link_flags.items()}
+        save_json_file(cfg, path)
 
     def change_options(self, options, is_add):
+        self._version += 1
         option_op = 'CC_FLAGS_ADD' if is_add else 'CC_FLAGS_DEL'
-        for option in options:
-            option_type = 'CC_USER_DEFINE_FLAGS'
-            if option in self._all_options.option_type_map:
-                option_type = self._all_options.option_type_map[option]
-
-            if option_type not in self._cfg['compileFlag']:
-                self._cfg['compileFlag'][option_type] = {}
-
-            flags = self._cfg['compileFlag'][option_type]
-            flags[option_op] = unique_list(flags.get(option_op, []) + [option])
+        option_type_map = self._all_options.option_type_map
+        compile_flags = self._cfg['compileFlag']
+        for option in map(sys.intern, options):
+            option_type = option_type_map.get(option, 'CC_USER_DEFINE_FLAGS')
+            compile_flags.setdefault(option_type, {}).setdefault(option_op, {})[option] = None
 
     def change_link_flags(self, flags, is_add):
+        self._version += 1
         link_op = 'LINK_FLAG_ADD' if is_add else 'LINK_FLAG_DEL'
-        new_flags = self._cfg['linkFlag'].get(link_op, []) + flags
-        self._cfg['linkFlag'][link_op] = unique_list(new_flags)
+        link_flags = self._cfg['linkFlag'].setdefault(link_op, {})
+        for flag in map(sys.intern, flags):
+            link_flags[flag] = None
 
     def add_debug_options(self):
-        flags_add = {'CC_FLAGS_ADD': ['-g3', '-gdwarf-2']}
-        flags_del = {'CC_FLAGS_DEL': ['-O2', '-D_FORTIFY_SOURCE=2']}
-
-        self._cfg['compileFlag']['CC_DEBUG_FLAGS'] = flags_add
-        self._cfg['compileFlag']['CC_OPT_LEVEL'] = flags_del
+        self._version += 1
+        # New dicts are needed, the options can be changed by change_options later.
+        compile_flags = self._cfg['compileFlag']
+        compile_flags['CC_DEBUG_FLAGS'] = {'CC_FLAGS_ADD': dict.fromkeys(self.debug_options_add)}
+        compile_flags['CC_OPT_LEVEL'] = {'CC_FLAGS_DEL': dict.fromkeys(self.debug_options_del)}
 
     def filter_hitls_defines(self):
-        for flag in list(self.link_flags.keys()):
-            del self.link_flags[flag]
-
-        for flag in list(self.options.keys()):
-            if flag != 'CC_USER_DEFINE_FLAGS' and flag != 'CC_DEFINE_FLAGS':
-                del self.options[flag]
+        self._version += 1
+        self._cfg['linkFlag'].clear()
+        define_types = self.define_option_types
+        self._cfg['compileFlag'] = {k: v for k, v in self.options.items() if k in define_types}
 
 class CompileParser:
     """
@@ -777,12 +896,19 @@ class CompileParser:
         linkFlag: link option
     """
 
+    # Targets of the link flags.
+    link_targets = frozenset(['PUBLIC', 'SHARED', 'EXE'])
+
+    __slots__ = ('_fp', '_all_options', '_cfg', '_union_cache')
+
     def __init__(self, all_options: CompleteOptionParser, file_path):
         self._fp = file_path
         self._all_options = all_options
-        with open(file_path, 'r') as f:
-            self._cfg = json.loads(f.read())
+        # The file is only read, so the parsed content can be shared.
+        self._cfg = load_json_file_cached(file_path)
         self._file_check()
+        # Result of union_options for each user configuration: (custom_cfg, version, options, flags).
+        self._union_cache = {}
 
     @property
     def options(self):
@@ -799,40 +925,64 @@ class CompileParser:
             if option_type not in self._all_options.type_options_map:
                 raise ValueError("no '{}' option type in complete_options.json".format(option_type))
 
+            type_options = self._all_options.type_options_set[option_type]
             for option in self.options[option_type]:
-                if option not in self._all_options.type_options_map[option_type]:
+                if option not in type_options:
                     raise ValueError("unrecognized option '{}' in type {}.".format(option, option_type))
         for option_type in self._cfg['linkFlag']:
-            if option_type not in ['PUBLIC', 'SHARED', 'EXE']:
+            if option_type not in self.link_targets:
                 raise FileNotFoundError('Incorrect file format: %s' % self._fp)
 
     def union_options(self, custom_cfg: CompileConfigParser):
+        """
+        Merge the compilation options and link flags with the user configuration.
+        The result is cached until the user configuration changes, the caller gets a copy of it.
+        """
+        cached = self._union_cache.get(id(custom_cfg))
+        if cached and cached[0] is custom_cfg and cached[1] == custom_cfg.version:
+            options, flags = cached[2], cached[3]
+        else:
+            options, flags = self._union_options(custom_cfg)
+            self._union_cache[id(custom_cfg)] = (custom_cfg, custom_cfg.version, options, flags)
+        return list(options), {target: list(target_flags) for target, target_flags in flags.items()}
+
+    def _union_options(self, custom_cfg: CompileConfigParser):
+        options = self._union_compile_options(self.options, custom_cfg.options, CompleteOptionParser.option_order)
+        flags = self._union_link_flags(self.link_flags, custom_cfg.link_flags, self.link_targets)
+        return options, flags
+
+    @staticmethod
+    def _union_compile_options(base_cfg: dict, custom_options: dict, option_order: list):
         options = []
-        for option_type in CompleteOptionParser.option_order:
-            options.extend(self.options.get(option_type, []))
-            if option_type not in custom_cfg.options:
+        option_set = set()
+        for option_type in option_order:
+            base_options = base_cfg.get(option_type, ())
+            options.extend(base_options)
+            option_set.update(base_options)
+            type_cfg = custom_options.get(option_type)
+            if type_cfg is None:
                 continue
-            for option in custom_cfg.options[option_type].get('CC_FLAGS_ADD', []):
-                if option not in options:
-                    options.append(option)
-            for option in custom_cfg.options[option_type].get('CC_FLAGS_DEL', []):
-                if option in options:
-                    options.remove(option)
-
-        flags = self.link_flags
-        for flag in custom_cfg.link_flags.get('LINK_FLAG_ADD', []):
-            if flag not in flags['PUBLIC']:
-                flags['PUBLIC'].append(flag)
-            if flag not in flags['EXE']:
-                flags['EXE'].append(flag)
-            if flag not in flags['SHARED']:
-                flags['SHARED'].append(flag)
-        for flag in custom_cfg.link_flags.get('LINK_FLAG_DEL', []):
-            if flag in flags['PUBLIC']:
-                flags['PUBLIC'].remove(flag)
-            if flag in flags['EXE']:
-                flags['EXE'].remove(flag)
-            if flag in flags['SHARED']:
-                flags['SHARED'].remove(flag)
+            # options = (options | add) - del, keeping the order of the options.
+            # The user options are stored in dicts, so they have no duplicates.
+            add_options = [x for x in type_cfg.get('CC_FLAGS_ADD', ()) if x not in option_set]
+            options.extend(add_options)
+            option_set.update(add_options)
+            del_options = option_set.intersection(type_cfg.get('CC_FLAGS_DEL', ()))
+            if del_options:
+                options = [x for x in options if x not in del_options]
+                option_set -= del_options
+        return options
 
-        return options, flags
+    @staticmethod
+    def _union_link_flags(base_flags: dict, custom_flags: dict, targets: frozenset):
+        # Copy the link flags, the parsed compile.json is shared and must not be changed.
+        flags = {target: list(target_flags) for target, target_flags in base_flags.items()}
+        add_flags = custom_flags.get('LINK_FLAG_ADD', ())
+        del_flags = set(custom_flags.get('LINK_FLAG_DEL', ()))
+        for target in targets:
+            target_flags = flags[target]
+            target_set = set(target_flags)
+            target_flags.extend(x for x in add_flags if x not in target_set)
+            if del_flags:
+                flags[target] = [x for x in target_flags if x not in del_flags]
+        return flags
@@ -16,20 +16,34 @@ import sys
 sys.dont_write_bytecode = True
 import os
 import json
+import functools
+# orjson and ujson parse faster than json, use one of them if it is installed.
+try:
+    import orjson as fast_json
+except ImportError:
+    try:
+        import ujson as fast_json
+    except ImportError:
+        fast_json = None
+# ijson parses large files incrementally, without reading the whole file into memory.
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Size in bytes above which json files are parsed with ijson.
+STREAM_PARSE_SIZE = 256 * 1024
 
 # Convert x to list
 def trans2list(x):
-    if x == None: return []
+    # Lists are the most common case, check them first.
     if type(x) == list: return x
+    if x is None: return []
     if type(x) == set: return x
     if type(x) == str: return [x]
 
     raise ValueError('Unsupported type: "%s"' % type(x))
 
-# list unique
-def unique_list(x):
-    return list(dict.fromkeys(x))
-
 def copy_file(src_file, dest_file, isCoverd=True):
     if not os.path.exists(src_file):
         raise FileNotFoundError('Src file not found: ' + src_file)
@@ -40,6 +54,25 @@ def copy_file(src_file, dest_file, isCoverd=True):
     else:
         shutil.copy2(src_file, dest_file)
 
+def load_json_file(path):
+    if ijson and os.path.getsize(path) > STREAM_PARSE_SIZE:
+        with open(path, 'rb') as f:
+            return dict(ijson.kvitems(f, '', use_float=True))
+    if fast_json:
+        with open(path, 'rb') as f:
+            return fast_json.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+@functools.lru_cache(maxsize=32)
+def _load_json_file_cached(path, mtime_ns, size):
+    return load_json_file(path)
+
+# The parsed content is shared by all callers until the file is modified, so it must not be changed.
+def load_json_file_cached(path):
+    st = os.stat(path)
+    return _load_json_file_cached(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
 def save_json_file(content, path):
     with open(path, 'w') as f:
         f.write(json.dumps(content, indent=4))